@@ -4,11 +4,11 @@ from fastapi import Request
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import Settings, get_settings
+from app.core.config import RuntimeSettings, get_settings
 from app.db.session import get_session
 
 
-async def get_settings_dep() -> Settings:
+async def get_settings_dep() -> RuntimeSettings:
     return get_settings()
 
 
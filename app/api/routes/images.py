@@ -1,17 +1,29 @@
+import os
+import stat
 from datetime import datetime
 from pathlib import Path
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+import anyio.to_thread
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.responses import FileResponse
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db_session, get_redis_client, get_settings_dep
 from app.core.logging import get_logger
-from app.core.config import Settings
+from app.core.config import RuntimeSettings
 from app.models.image_job import JobStatus
 from app.schemas.image_job import (
+    JOBS_LIST_ADAPTER,
     ImageJobCreate,
     ImageJobBatchCreate,
     ImageJobBatchError,
@@ -22,21 +34,27 @@ from app.schemas.image_job import (
 from app.schemas.pagination import Pagination
 from app.services.jobs import (
     DuplicateJobError,
+    InvalidCursorError,
     create_job,
+    create_jobs_bulk,
+    encode_cursor,
     get_job,
     list_jobs,
+    list_jobs_after,
 )
 
 router = APIRouter(prefix="/images", tags=["images"])
 logger = get_logger("thumbforge.api.images")
 
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 
 @router.post("", status_code=status.HTTP_202_ACCEPTED, response_model=ImageJobRead)
 async def submit_image_job(
     payload: ImageJobCreate,
     session: AsyncSession = Depends(get_db_session),
     redis: Redis = Depends(get_redis_client),
-    settings: Settings = Depends(get_settings_dep),
+    settings: RuntimeSettings = Depends(get_settings_dep),
 ) -> ImageJobRead:
     try:
         job = await create_job(
@@ -57,80 +75,128 @@ async def submit_batch_image_jobs(
     payload: ImageJobBatchCreate,
     session: AsyncSession = Depends(get_db_session),
     redis: Redis = Depends(get_redis_client),
-    settings: Settings = Depends(get_settings_dep),
+    settings: RuntimeSettings = Depends(get_settings_dep),
 ) -> ImageJobBatchResponse:
-    accepted: list[ImageJobRead] = []
-    duplicates: list[ImageJobRead] = []
-    failed: list[ImageJobBatchError] = []
-
-    for url in payload.urls:
-        try:
-            job = await create_job(
-                session=session, redis=redis, settings=settings, url=str(url)
-            )
-        except DuplicateJobError as exc:
-            duplicates.append(ImageJobRead.model_validate(exc.job))
-            continue
-        except Exception as exc:  # pragma: no cover - defensive logging
-            logger.exception("api.batch_submit_failed", url=str(url), error=str(exc))
-            failed.append(ImageJobBatchError(url=url, detail=str(exc), job_id=None))
-            continue
-
-        accepted.append(ImageJobRead.model_validate(job))
+    urls = [str(url) for url in payload.urls]
+    try:
+        accepted, duplicates, failed = await create_jobs_bulk(
+            session=session, redis=redis, settings=settings, urls=urls
+        )
+    except Exception as exc:  # pragma: no cover - defensive logging
+        logger.exception("api.batch_submit_failed", urls=urls, error=str(exc))
+        return ImageJobBatchResponse(
+            accepted=[],
+            duplicates=[],
+            failed=[
+                ImageJobBatchError(url=url, detail=str(exc), job_id=None)
+                for url in payload.urls
+            ],
+        )
 
     return ImageJobBatchResponse(
-        accepted=accepted, duplicates=duplicates, failed=failed
+        accepted=JOBS_LIST_ADAPTER.validate_python(accepted, from_attributes=True),
+        duplicates=JOBS_LIST_ADAPTER.validate_python(duplicates, from_attributes=True),
+        failed=[
+            ImageJobBatchError(url=job.url, detail=job.error or "", job_id=job.id)
+            for job in failed
+        ],
     )
 
 
-@router.get("", response_model=ImageJobListResponse)
+@router.get("", responses={200: {"model": ImageJobListResponse}})
 async def list_image_jobs(
     status_filter: JobStatus | None = Query(None, alias="status"),
     created_before: datetime | None = Query(None),
     created_after: datetime | None = Query(None),
     limit: int | None = Query(None, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
     session: AsyncSession = Depends(get_db_session),
-    settings: Settings = Depends(get_settings_dep),
-) -> ImageJobListResponse:
+    settings: RuntimeSettings = Depends(get_settings_dep),
+) -> Response:
     requested_limit = limit or settings.default_page_size
     page_size = min(requested_limit, settings.max_page_size)
-    jobs, total = await list_jobs(
-        session=session,
-        status=status_filter,
-        created_before=created_before,
-        created_after=created_after,
-        limit=page_size,
-        offset=offset,
-    )
+    total: int | None
+    if cursor is not None:
+        if offset:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="offset cannot be combined with cursor",
+            )
+        try:
+            jobs, has_more = await list_jobs_after(
+                session=session,
+                status=status_filter,
+                created_before=created_before,
+                created_after=created_after,
+                limit=page_size,
+                cursor=cursor,
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+            ) from exc
+        total = None
+    else:
+        jobs, total = await list_jobs(
+            session=session,
+            status=status_filter,
+            created_before=created_before,
+            created_after=created_after,
+            limit=page_size,
+            offset=offset,
+        )
+        has_more = offset + len(jobs) < total
     pagination = Pagination(
         total=total,
         limit=page_size,
         offset=offset,
-        has_more=offset + len(jobs) < total,
+        has_more=has_more,
+        next_cursor=encode_cursor(jobs[-1]) if has_more else None,
     )
-    items = [ImageJobRead.model_validate(job) for job in jobs]
-    return ImageJobListResponse(items=items, pagination=pagination)
+    # Read endpoints bypass response_model, which would validate and encode
+    # every item a second time.
+    items = JOBS_LIST_ADAPTER.validate_python(jobs, from_attributes=True)
+    # Both parts are already validated, so the envelope is assembled without
+    # another validation pass and dumped by pydantic-core.
+    body = ImageJobListResponse.model_construct(items=items, pagination=pagination)
+    return Response(content=body.model_dump_json(), media_type="application/json")
 
 
-@router.get("/{job_id}", response_model=ImageJobRead)
+@router.get("/{job_id}", responses={200: {"model": ImageJobRead}})
 async def get_image_job(
     job_id: UUID,
     session: AsyncSession = Depends(get_db_session),
-) -> ImageJobRead:
+) -> Response:
     job = await get_job(session=session, job_id=job_id)
     if job is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
         )
-    return ImageJobRead.model_validate(job)
+    body = ImageJobRead.model_validate(job)
+    return Response(content=body.model_dump_json(), media_type="application/json")
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = (value.strip() for value in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
 
 
 @router.get("/{job_id}/thumbnail")
 async def get_job_thumbnail(
     job_id: UUID,
+    request: Request,
     session: AsyncSession = Depends(get_db_session),
 ) -> Response:
+    # A job's thumbnail never changes once written, so a client holding the
+    # ETag can be answered without touching the database.
+    etag = f'"{job_id}"'
+    cache_headers = {"Cache-Control": THUMBNAIL_CACHE_CONTROL, "ETag": etag}
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
     job = await get_job(session=session, job_id=job_id)
     if job is None:
         raise HTTPException(
@@ -147,10 +213,22 @@ async def get_job_thumbnail(
             status_code=status.HTTP_404_NOT_FOUND, detail="Thumbnail unavailable"
         )
 
+    # Stat once off the event loop and hand the result to FileResponse, which
+    # would otherwise stat the file again before sending it.
     path = Path(thumbnail_path)
-    if not path.is_file():
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except OSError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Thumbnail missing"
         )
 
-    return FileResponse(path, media_type="image/jpeg", filename=f"{job_id}.jpg")
+    return FileResponse(
+        path,
+        media_type="image/jpeg",
+        filename=f"{job_id}.jpg",
+        headers=cache_headers,
+        stat_result=stat_result,
+    )
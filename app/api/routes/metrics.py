@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_session
+from app.api.deps import get_db_session, get_redis_client, get_settings_dep
+from app.core.config import RuntimeSettings
 from app.schemas.image_job import ImageJobMetrics
-from app.services.jobs import get_metrics
+from app.services.jobs import get_cached_metrics
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 
 @router.get("", response_model=ImageJobMetrics)
 async def read_metrics(
+    response: Response,
     session: AsyncSession = Depends(get_db_session),
+    redis: Redis = Depends(get_redis_client),
+    settings: RuntimeSettings = Depends(get_settings_dep),
 ) -> ImageJobMetrics:
-    metrics = await get_metrics(session=session)
+    metrics = await get_cached_metrics(session=session, redis=redis, settings=settings)
+    # Matches the server-side cache TTL; polling faster cannot see newer counts.
+    response.headers["Cache-Control"] = f"max-age={settings.metrics_cache_ttl_seconds}"
     return ImageJobMetrics(
         total=metrics.get("total", 0),
         pending=metrics.get("pending", 0),
@@ -1,14 +1,113 @@
 import asyncio
 
+from sqlalchemy import Connection, bindparam, func, select, text, update
+
+from app.core.logging import get_logger
 from app.db.session import engine
 from app.models import ImageJob  # noqa: F401  Ensures models are registered
 from app.models.base import Base
+from app.services.jobs import compute_url_hash
+
+logger = get_logger("thumbforge.db")
+
+URL_HASH_BACKFILL_BATCH_SIZE = 1000
+
+# create_all never alters tables that already exist, so databases created
+# before timestamps moved to server-side defaults would reject every INSERT.
+# ALTER TABLE takes an ACCESS EXCLUSIVE lock, so it is only issued for columns
+# that are still missing their default rather than on every startup.
+_MISSING_TIMESTAMP_DEFAULTS_SQL = text(
+    "SELECT column_name FROM information_schema.columns "
+    "WHERE table_schema = current_schema() AND table_name = :table_name "
+    "AND column_name IN ('created_at', 'updated_at') AND column_default IS NULL"
+).bindparams(table_name=ImageJob.__tablename__)
+
+
+def _set_timestamp_defaults(conn: Connection) -> None:
+    columns = conn.execute(_MISSING_TIMESTAMP_DEFAULTS_SQL).scalars().all()
+    if not columns:
+        return
+    clauses = ", ".join(
+        f"ALTER COLUMN {column} SET DEFAULT now()" for column in columns
+    )
+    conn.execute(text(f"ALTER TABLE {ImageJob.__tablename__} {clauses}"))
+
+
+# create_all skips existing tables entirely, indexes included, so indexes
+# added to the model since a database was created are built here. The
+# single-column status index they supersede is dropped.
+_SUPERSEDED_INDEXES_DDL = text("DROP INDEX IF EXISTS ix_image_jobs_status")
+
+
+def _create_indexes(conn: Connection) -> None:
+    for index in ImageJob.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    conn.execute(_SUPERSEDED_INDEXES_DDL)
+
+
+def _create_schema(conn: Connection) -> None:
+    Base.metadata.create_all(conn)
+    _create_indexes(conn)
+    _set_timestamp_defaults(conn)
 
 
 async def init_db() -> None:
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_schema)
 
 
 def init_db_sync() -> None:
     asyncio.run(init_db())
+
+
+# Rows written before url_hash moved from SHA-256 to xxh3-128 carry 64-character
+# digests that no new submission matches, so the dedup policies cannot see
+# them. The backfill is a one-off run from scripts/init_db.py, not API startup.
+_STALE_URL_HASHES_STMT = (
+    select(ImageJob.id, ImageJob.url)
+    .where(func.length(ImageJob.url_hash) != 32)
+    .limit(URL_HASH_BACKFILL_BATCH_SIZE)
+)
+_jobs_table = ImageJob.__table__
+# updated_at is kept as is: it is the claim time reclaim_stuck_jobs relies on.
+_SET_URL_HASH_STMT = (
+    update(_jobs_table)
+    .where(_jobs_table.c.id == bindparam("job_id"))
+    .values(url_hash=bindparam("new_url_hash"), updated_at=_jobs_table.c.updated_at)
+)
+_URL_HASH_LENGTH_SQL = text(
+    "SELECT character_maximum_length FROM information_schema.columns "
+    "WHERE table_schema = current_schema() AND table_name = :table_name "
+    "AND column_name = 'url_hash'"
+).bindparams(table_name=ImageJob.__tablename__)
+_NARROW_URL_HASH_DDL = text(
+    f"ALTER TABLE {ImageJob.__tablename__} ALTER COLUMN url_hash TYPE varchar(32)"
+)
+
+
+async def backfill_url_hashes() -> int:
+    """Rehash rows still carrying SHA-256 digests and narrow the column.
+
+    Each batch commits on its own, so an interrupted run resumes where it
+    stopped. Returns the number of rows rehashed.
+    """
+    rehashed = 0
+    while True:
+        async with engine.begin() as conn:
+            rows = (await conn.execute(_STALE_URL_HASHES_STMT)).all()
+            if not rows:
+                break
+            await conn.execute(
+                _SET_URL_HASH_STMT,
+                [
+                    {"job_id": job_id, "new_url_hash": compute_url_hash(url)}
+                    for job_id, url in rows
+                ],
+            )
+        rehashed += len(rows)
+        logger.info("db.url_hashes_backfilled", count=rehashed)
+    async with engine.begin() as conn:
+        length = (await conn.execute(_URL_HASH_LENGTH_SQL)).scalar_one_or_none()
+        if length is not None and length > 32:
+            await conn.execute(_NARROW_URL_HASH_DDL)
+    return rehashed
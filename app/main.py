@@ -10,7 +10,7 @@ from app.api.routes import images, metrics
 from app.core.config import get_settings
 from app.core.logging import configure_logging
 from app.db.init_db import init_db
-from app.db.session import engine
+from app.db.session import engine, warm_pool
 
 
 @asynccontextmanager
@@ -20,6 +20,7 @@ async def lifespan(app: FastAPI):
 
     Path(settings.storage_path).mkdir(parents=True, exist_ok=True)
     await init_db()
+    await warm_pool()
 
     redis = Redis.from_url(settings.redis_url, decode_responses=True)
     app.state.redis = redis
@@ -2,7 +2,7 @@ import enum
 import uuid
 from typing import Any
 
-from sqlalchemy import JSON, Enum, Integer, String, Text
+from sqlalchemy import JSON, Enum, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -23,10 +23,25 @@ class ImageJob(TimestampMixin, Base):
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
     url: Mapped[str] = mapped_column(Text, nullable=False)
-    url_hash: Mapped[str] = mapped_column(String(64), index=True, nullable=False)
-    status: Mapped[JobStatus] = mapped_column(
-        Enum(JobStatus), index=True, nullable=False
-    )
+    url_hash: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    status: Mapped[JobStatus] = mapped_column(Enum(JobStatus), nullable=False)
     attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     result: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+# Serves status-filtered listings and keyset pages in (created_at, id) order
+# and the per-status metrics count; supersedes a single-column index on
+# status.
+Index(
+    "ix_image_jobs_status_created_at",
+    ImageJob.status,
+    ImageJob.created_at.desc(),
+    ImageJob.id.desc(),
+)
+# Small partial index over jobs still moving through the queue.
+Index(
+    "ix_image_jobs_active_created_at",
+    ImageJob.created_at.desc(),
+    postgresql_where=ImageJob.status.in_([JobStatus.pending, JobStatus.processing]),
+)
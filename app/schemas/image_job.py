@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Any
 from uuid import UUID
 
-from pydantic import AnyHttpUrl, BaseModel, ConfigDict, Field
+from pydantic import AnyHttpUrl, BaseModel, ConfigDict, Field, TypeAdapter
 
 from app.models.image_job import JobStatus
 from app.schemas.pagination import Pagination
@@ -29,6 +29,11 @@ class ImageJobRead(BaseModel):
     error: str | None
 
 
+# Built once at import so list endpoints reuse a single compiled validator and
+# serializer instead of constructing one model per row.
+JOBS_LIST_ADAPTER = TypeAdapter(list[ImageJobRead])
+
+
 class ImageJobListResponse(BaseModel):
     items: list[ImageJobRead]
     pagination: Pagination
@@ -2,7 +2,8 @@ from pydantic import BaseModel
 
 
 class Pagination(BaseModel):
-    total: int
+    total: int | None
     limit: int
     offset: int
     has_more: bool
+    next_cursor: str | None = None
@@ -1,79 +1,239 @@
 from __future__ import annotations
 
-import hashlib
-from datetime import datetime
+import base64
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Any
 from uuid import UUID
 
+import orjson
+import xxhash
 from redis.asyncio import Redis
-from sqlalchemy import Select, func, select
+from sqlalchemy import Select, bindparam, func, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import distinct_on
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import Settings
+from app.core.config import RuntimeSettings
+from app.core.logging import get_logger
 from app.models.image_job import ImageJob, JobStatus
 
 
+logger = get_logger("thumbforge.services.jobs")
+
+
 class DuplicateJobError(Exception):
     def __init__(self, job: ImageJob) -> None:
         super().__init__("A job for this URL already exists.")
         self.job = job
 
 
+class InvalidCursorError(ValueError):
+    def __init__(self, cursor: str) -> None:
+        super().__init__("Malformed pagination cursor.")
+        self.cursor = cursor
+
+
+# Hot-path statements are built once at import time and executed with bound
+# parameters, so requests skip constructing the Select on every call.
+_EXISTING_STMT: Select[tuple[ImageJob]] = (
+    select(ImageJob)
+    .where(ImageJob.url_hash == bindparam("url_hash"))
+    .order_by(ImageJob.created_at.desc())
+    .limit(1)
+)
+_LATEST_BY_HASH_STMT: Select[tuple[ImageJob]] = (
+    select(ImageJob)
+    .where(ImageJob.url_hash.in_(bindparam("url_hashes", expanding=True)))
+    .order_by(ImageJob.url_hash, ImageJob.created_at.desc())
+    .ext(distinct_on(ImageJob.url_hash))
+)
+_METRICS_STMT = select(ImageJob.status, func.count(ImageJob.id)).group_by(
+    ImageJob.status
+)
+
+
 def normalize_url(url: str) -> str:
     return url.strip()
 
 
+def _dedup_key(url: str) -> str:
+    return normalize_url(url).lower()
+
+
 def compute_url_hash(url: str) -> str:
-    normalized = normalize_url(url).lower()
-    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    # Dedup is confirmed against the stored row's URL in _resolve_duplicate, so
+    # a fast non-cryptographic hash is sufficient for the url_hash index.
+    return xxhash.xxh3_128_hexdigest(_dedup_key(url).encode("utf-8"))
+
+
+# Scores are read from the Redis clock, which the worker's claim script also
+# uses, so clock skew between API and worker hosts cannot delay fresh jobs or
+# release retries early. ARGV[1] is the delay in seconds and the remaining
+# arguments are job ids, spaced a microsecond apart to keep a batch in
+# submission order (equal scores would otherwise be ordered by id).
+SCHEDULE_JOBS_LUA = """
+local t = redis.call('TIME')
+local ready_at = tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1])
+for i = 2, #ARGV do
+    local score = string.format('%.6f', ready_at + (i - 2) / 1000000)
+    redis.call('ZADD', KEYS[1], score, ARGV[i])
+end
+return #ARGV - 1
+"""
+
+
+def _url_hash_key(settings: RuntimeSettings, url_hash: str) -> str:
+    return f"{settings.url_hash_cache_prefix}:{url_hash}"
+
+
+async def enqueue_jobs(
+    redis: Redis, settings: RuntimeSettings, jobs: Sequence[ImageJob]
+) -> None:
+    """Schedule jobs for pickup now and record each as the latest for its URL hash.
+
+    The queue is a sorted set scored by the time a job becomes ready. All
+    writes go out in a single pipeline round trip.
+    """
+    if not jobs:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        # EVAL rather than EVALSHA: a pipeline would otherwise spend an extra
+        # round trip checking that the script is loaded.
+        pipe.eval(
+            SCHEDULE_JOBS_LUA, 1, settings.queue_name, 0, *(str(job.id) for job in jobs)
+        )
+        # Pointers are written under every policy, including allow-retry which
+        # never reads them, so switching to a dedup policy cannot pick up an
+        # older job from a pointer left behind before the switch.
+        for job in jobs:
+            pipe.set(
+                _url_hash_key(settings, job.url_hash),
+                str(job.id),
+                ex=settings.url_hash_cache_ttl_seconds,
+            )
+        await pipe.execute()
+
+
+async def enqueue_job(redis: Redis, settings: RuntimeSettings, job: ImageJob) -> None:
+    await enqueue_jobs(redis, settings, [job])
+
+
+async def schedule_jobs(
+    redis: Redis,
+    settings: RuntimeSettings,
+    job_ids: Sequence[str],
+    delay_seconds: float = 0.0,
+) -> None:
+    """Make ``job_ids`` ready ``delay_seconds`` from now on the Redis clock."""
+    if job_ids:
+        await redis.eval(
+            SCHEDULE_JOBS_LUA, 1, settings.queue_name, delay_seconds, *job_ids
+        )
+
+
+async def reschedule_job(
+    redis: Redis, settings: RuntimeSettings, job_id: UUID, delay_seconds: float
+) -> None:
+    await schedule_jobs(redis, settings, [str(job_id)], delay_seconds)
+
 
+async def _find_latest_job(
+    session: AsyncSession, redis: Redis, settings: RuntimeSettings, url_hash: str
+) -> ImageJob | None:
+    # The Redis pointer turns the lookup into a primary-key get; the indexed
+    # SELECT takes over when the key is missing, corrupt or names a deleted row.
+    cached_id = await redis.get(_url_hash_key(settings, url_hash))
+    if cached_id is not None:
+        try:
+            job_id = UUID(cached_id)
+        except ValueError:
+            logger.warning("jobs.invalid_url_hash_pointer", url_hash=url_hash)
+        else:
+            job = await session.get(ImageJob, job_id)
+            if job is not None:
+                return job
+    result = await session.execute(_EXISTING_STMT, {"url_hash": url_hash})
+    return result.scalars().first()
+
+
+def _resolve_duplicate(
+    settings: RuntimeSettings, existing_job: ImageJob, url: str
+) -> ImageJob | None:
+    """Apply the duplicate policy to the latest job for a URL.
 
-async def enqueue_job(redis: Redis, queue_name: str, job_id: UUID) -> None:
-    await redis.lpush(queue_name, str(job_id))
+    Returns the job to reuse, raises ``DuplicateJobError`` when the submission
+    must be rejected, or returns ``None`` when a new job should be created.
+    A job whose URL only shares the hash is never treated as a duplicate.
+    """
+    if _dedup_key(existing_job.url) != _dedup_key(url):
+        return None
+    if (
+        settings.duplicate_handling == "reuse-completed"
+        and existing_job.status == JobStatus.completed
+    ):
+        return existing_job
+    if settings.duplicate_handling == "reject-active" and existing_job.status in {
+        JobStatus.pending,
+        JobStatus.processing,
+    }:
+        raise DuplicateJobError(existing_job)
+    return None
+
+
+async def _fail_unqueued_jobs(
+    session: AsyncSession, jobs: Sequence[ImageJob], exc: Exception
+) -> None:
+    """Mark committed jobs that never reached the queue as failed.
+
+    Without this they would sit in ``pending`` with nothing left to pick them up.
+    """
+    stmt = (
+        update(ImageJob)
+        .where(ImageJob.id.in_([job.id for job in jobs]))
+        .values(status=JobStatus.failed, error=f"Failed to enqueue job: {exc}")
+        .returning(ImageJob)
+        .execution_options(populate_existing=True)
+    )
+    await session.execute(stmt)
+    await session.commit()
 
 
 async def create_job(
     *,
     session: AsyncSession,
     redis: Redis,
-    settings: Settings,
+    settings: RuntimeSettings,
     url: str,
 ) -> ImageJob:
     url_hash = compute_url_hash(url)
 
-    existing_stmt: Select[tuple[ImageJob]] = (
-        select(ImageJob)
-        .where(ImageJob.url_hash == url_hash)
-        .order_by(ImageJob.created_at.desc())
-        .limit(1)
+    # Under allow-retry an existing job never changes the outcome, so the
+    # lookup is skipped entirely.
+    if settings.duplicate_handling != "allow-retry":
+        existing_job = await _find_latest_job(session, redis, settings, url_hash)
+        if existing_job:
+            reused_job = _resolve_duplicate(settings, existing_job, url)
+            if reused_job is not None:
+                return reused_job
+
+    # RETURNING hands back the server-populated row, so no refresh SELECT is needed.
+    insert_stmt = (
+        insert(ImageJob)
+        .values(url=url, url_hash=url_hash, status=JobStatus.pending)
+        .returning(ImageJob)
     )
-    existing_result = await session.execute(existing_stmt)
-    existing_job = existing_result.scalars().first()
-
-    if existing_job:
-        if (
-            settings.duplicate_handling == "reuse-completed"
-            and existing_job.status == JobStatus.completed
-        ):
-            return existing_job
-        if settings.duplicate_handling == "reject-active" and existing_job.status in {
-            JobStatus.pending,
-            JobStatus.processing,
-        }:
-            raise DuplicateJobError(existing_job)
-
-    job = ImageJob(url=url, url_hash=url_hash, status=JobStatus.pending)
-    session.add(job)
 
     try:
+        job = (await session.execute(insert_stmt)).scalar_one()
         await session.commit()
     except IntegrityError:
         await session.rollback()
         # Re-fetch job in case of race condition
-        retry_result = await session.execute(existing_stmt)
+        retry_result = await session.execute(_EXISTING_STMT, {"url_hash": url_hash})
         retry_job = retry_result.scalars().first()
-        if retry_job is None:
+        if retry_job is None or _dedup_key(retry_job.url) != _dedup_key(url):
             raise
         if settings.duplicate_handling == "reject-active" and retry_job.status in {
             JobStatus.pending,
@@ -82,11 +242,192 @@ async def create_job(
             raise DuplicateJobError(retry_job)
         return retry_job
 
-    await session.refresh(job)
-    await enqueue_job(redis, settings.queue_name, job.id)
+    try:
+        await enqueue_job(redis, settings, job)
+    except Exception as exc:
+        await _fail_unqueued_jobs(session, [job], exc)
+        raise
     return job
 
 
+async def create_jobs_bulk(
+    *,
+    session: AsyncSession,
+    redis: Redis,
+    settings: RuntimeSettings,
+    urls: Sequence[str],
+) -> tuple[list[ImageJob], list[ImageJob], list[ImageJob]]:
+    """Create jobs for many URLs with one lookup, one INSERT and one Redis flush.
+
+    Applies the same duplicate policy as ``create_job`` as if the URLs had been
+    submitted one after another, and returns ``(accepted, duplicates, failed)``
+    in submission order. ``failed`` holds jobs that were stored but could not
+    be enqueued; they are marked failed with the enqueue error. An in-batch
+    duplicate of such a job is reported in ``failed`` too, so every URL has
+    exactly one outcome.
+    """
+    url_hashes = [compute_url_hash(url) for url in urls]
+
+    latest_jobs: dict[str, ImageJob] = {}
+    if settings.duplicate_handling != "allow-retry":
+        latest_result = await session.execute(
+            _LATEST_BY_HASH_STMT, {"url_hashes": list(set(url_hashes))}
+        )
+        latest_jobs = {job.url_hash: job for job in latest_result.scalars()}
+
+    # Each entry is (is_duplicate, job) for known jobs, or (is_duplicate, row
+    # index) for jobs created by this batch.
+    plan: list[tuple[bool, ImageJob | int]] = []
+    new_rows: list[dict[str, Any]] = []
+    created_in_batch: dict[str, int] = {}
+    for url, url_hash in zip(urls, url_hashes):
+        url_key = _dedup_key(url)
+        if url_key in created_in_batch:
+            # A job created earlier in this batch is still pending.
+            if settings.duplicate_handling == "reject-active":
+                plan.append((True, created_in_batch[url_key]))
+                continue
+        elif url_hash in latest_jobs:
+            try:
+                reused_job = _resolve_duplicate(settings, latest_jobs[url_hash], url)
+            except DuplicateJobError as exc:
+                plan.append((True, exc.job))
+                continue
+            if reused_job is not None:
+                plan.append((False, reused_job))
+                continue
+
+        created_in_batch[url_key] = len(new_rows)
+        plan.append((False, len(new_rows)))
+        new_rows.append({"url": url, "url_hash": url_hash, "status": JobStatus.pending})
+
+    created: list[ImageJob] = []
+    if new_rows:
+        insert_stmt = insert(ImageJob).returning(
+            ImageJob, sort_by_parameter_order=True
+        )
+        try:
+            created = list((await session.scalars(insert_stmt, new_rows)).all())
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise
+        try:
+            await enqueue_jobs(redis, settings, created)
+        except Exception as exc:
+            logger.exception("jobs.enqueue_failed", count=len(created), error=str(exc))
+            await _fail_unqueued_jobs(session, created, exc)
+
+    accepted: list[ImageJob] = []
+    duplicates: list[ImageJob] = []
+    failed: list[ImageJob] = []
+    for is_duplicate, target in plan:
+        if isinstance(target, int):
+            job = created[target]
+            if job.status == JobStatus.failed:
+                failed.append(job)
+                continue
+        else:
+            job = target
+        (duplicates if is_duplicate else accepted).append(job)
+    return accepted, duplicates, failed
+
+
+def encode_cursor(job: ImageJob) -> str:
+    raw = f"{job.created_at.isoformat()}|{job.id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, job_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(job_id)
+    except ValueError as exc:
+        raise InvalidCursorError(cursor) from exc
+
+
+def _list_filters(
+    has_status: bool, has_created_before: bool, has_created_after: bool
+) -> list[Any]:
+    filters = []
+    if has_status:
+        filters.append(ImageJob.status == bindparam("status"))
+    if has_created_before:
+        filters.append(ImageJob.created_at <= bindparam("created_before"))
+    if has_created_after:
+        filters.append(ImageJob.created_at >= bindparam("created_after"))
+    return filters
+
+
+@lru_cache(maxsize=8)
+def _list_jobs_stmt(
+    has_status: bool, has_created_before: bool, has_created_after: bool
+) -> Select[tuple[ImageJob, int]]:
+    # COUNT(*) OVER() returns the unpaginated total alongside each row, so the
+    # page and its total come back in a single round trip.
+    stmt: Select[tuple[ImageJob, int]] = select(
+        ImageJob, func.count().over().label("total")
+    )
+    filters = _list_filters(has_status, has_created_before, has_created_after)
+    if filters:
+        stmt = stmt.where(*filters)
+    return (
+        stmt.order_by(ImageJob.created_at.desc(), ImageJob.id.desc())
+        .limit(bindparam("limit"))
+        .offset(bindparam("offset"))
+    )
+
+
+@lru_cache(maxsize=8)
+def _list_jobs_after_stmt(
+    has_status: bool, has_created_before: bool, has_created_after: bool
+) -> Select[tuple[ImageJob]]:
+    # Keyset pagination: each page is a range scan starting just past the
+    # cursor row rather than an OFFSET that re-reads every earlier row.
+    filters = _list_filters(has_status, has_created_before, has_created_after)
+    filters.append(
+        tuple_(ImageJob.created_at, ImageJob.id)
+        < tuple_(
+            bindparam("cursor_created_at", type_=ImageJob.created_at.type),
+            bindparam("cursor_id", type_=ImageJob.id.type),
+        )
+    )
+    return (
+        select(ImageJob)
+        .where(*filters)
+        .order_by(ImageJob.created_at.desc(), ImageJob.id.desc())
+        .limit(bindparam("limit"))
+    )
+
+
+@lru_cache(maxsize=8)
+def _count_jobs_stmt(
+    has_status: bool, has_created_before: bool, has_created_after: bool
+) -> Select[tuple[int]]:
+    stmt: Select[tuple[int]] = select(func.count()).select_from(ImageJob)
+    filters = _list_filters(has_status, has_created_before, has_created_after)
+    if filters:
+        stmt = stmt.where(*filters)
+    return stmt
+
+
+def _list_params(
+    status: JobStatus | None,
+    created_before: datetime | None,
+    created_after: datetime | None,
+) -> tuple[tuple[bool, bool, bool], dict[str, Any]]:
+    shape = (status is not None, created_before is not None, created_after is not None)
+    params: dict[str, Any] = {}
+    if status is not None:
+        params["status"] = status
+    if created_before is not None:
+        params["created_before"] = created_before
+    if created_after is not None:
+        params["created_after"] = created_after
+    return shape, params
+
+
 async def list_jobs(
     *,
     session: AsyncSession,
@@ -96,27 +437,44 @@ async def list_jobs(
     limit: int,
     offset: int,
 ) -> tuple[list[ImageJob], int]:
-    stmt: Select[tuple[ImageJob]] = select(ImageJob)
-    filters = []
-    if status:
-        filters.append(ImageJob.status == status)
-    if created_before:
-        filters.append(ImageJob.created_at <= created_before)
-    if created_after:
-        filters.append(ImageJob.created_at >= created_after)
+    shape, params = _list_params(status, created_before, created_after)
+    result = await session.execute(
+        _list_jobs_stmt(*shape), {**params, "limit": limit, "offset": offset}
+    )
+    rows = result.all()
+    if rows:
+        return [row[0] for row in rows], int(rows[0].total)
 
-    if filters:
-        stmt = stmt.where(*filters)
+    # An empty page carries no window value; only pay for a count when the
+    # offset may have skipped past existing rows.
+    if offset == 0:
+        return [], 0
+    total = (await session.execute(_count_jobs_stmt(*shape), params)).scalar_one()
+    return [], int(total)
 
-    stmt = stmt.order_by(ImageJob.created_at.desc()).limit(limit).offset(offset)
-    result = await session.execute(stmt)
-    jobs = list(result.scalars())
 
-    count_stmt = select(func.count()).select_from(ImageJob)
-    if filters:
-        count_stmt = count_stmt.where(*filters)
-    total = (await session.execute(count_stmt)).scalar_one()
-    return jobs, int(total)
+async def list_jobs_after(
+    *,
+    session: AsyncSession,
+    status: JobStatus | None,
+    created_before: datetime | None,
+    created_after: datetime | None,
+    limit: int,
+    cursor: str,
+) -> tuple[list[ImageJob], bool]:
+    """Return the page following ``cursor`` and whether more rows remain.
+
+    No total is computed; counting would reintroduce the full scan that
+    keyset pagination avoids.
+    """
+    cursor_created_at, cursor_id = decode_cursor(cursor)
+    shape, params = _list_params(status, created_before, created_after)
+    params.update(
+        cursor_created_at=cursor_created_at, cursor_id=cursor_id, limit=limit + 1
+    )
+    result = await session.execute(_list_jobs_after_stmt(*shape), params)
+    jobs = list(result.scalars())
+    return jobs[:limit], len(jobs) > limit
 
 
 async def get_job(*, session: AsyncSession, job_id: UUID) -> ImageJob | None:
@@ -124,59 +482,148 @@ async def get_job(*, session: AsyncSession, job_id: UUID) -> ImageJob | None:
     return result
 
 
-async def mark_job_processing(
-    *, session: AsyncSession, job_id: UUID
+async def _update_job(
+    session: AsyncSession, job_id: UUID, *criteria: Any, **values: Any
 ) -> ImageJob | None:
-    job = await session.get(ImageJob, job_id, with_for_update=True)
-    if job is None:
-        return None
-    if job.status not in {JobStatus.pending, JobStatus.failed}:
-        return job
-    job.status = JobStatus.processing
-    job.attempts += 1
-    job.error = None
-    job.updated_at = datetime.utcnow()
+    """Apply ``values`` with a single UPDATE ... RETURNING and commit.
+
+    Returns ``None`` when no row matched ``job_id`` and ``criteria``.
+    """
+    stmt = (
+        update(ImageJob)
+        .where(ImageJob.id == job_id, *criteria)
+        .values(**values)
+        .returning(ImageJob)
+        .execution_options(populate_existing=True)
+    )
+    job = (await session.execute(stmt)).scalar_one_or_none()
     await session.commit()
-    await session.refresh(job)
     return job
 
 
+async def mark_job_processing(
+    *, session: AsyncSession, job_id: UUID, max_attempts: int
+) -> ImageJob | None:
+    """Claim a pending or failed job for processing.
+
+    Returns ``None`` unless this call's guarded UPDATE claimed the row, so a
+    job that is missing, already claimed elsewhere or out of attempts is never
+    processed again.
+    """
+    return await _update_job(
+        session,
+        job_id,
+        ImageJob.status.in_([JobStatus.pending, JobStatus.failed]),
+        ImageJob.attempts < max_attempts,
+        status=JobStatus.processing,
+        attempts=ImageJob.attempts + 1,
+        error=None,
+    )
+
+
+def _owns_run(attempt: int) -> tuple[Any, ...]:
+    # A run owns its job only while the row is still in the processing state it
+    # claimed; once reclaimed (and possibly claimed again) the attempt moves on.
+    return (ImageJob.status == JobStatus.processing, ImageJob.attempts == attempt)
+
+
 async def mark_job_completed(
-    *, session: AsyncSession, job_id: UUID, result_payload: dict[str, Any]
+    *,
+    session: AsyncSession,
+    job_id: UUID,
+    attempt: int,
+    result_payload: dict[str, Any],
 ) -> ImageJob | None:
-    job = await session.get(ImageJob, job_id, with_for_update=True)
-    if job is None:
-        return None
-    job.status = JobStatus.completed
-    job.result = result_payload
-    job.error = None
-    job.updated_at = datetime.utcnow()
-    await session.commit()
-    await session.refresh(job)
-    return job
+    """Complete the run claimed as ``attempt``.
+
+    Returns ``None`` when the run no longer owns the job, e.g. after it was
+    reclaimed past the visibility timeout.
+    """
+    return await _update_job(
+        session,
+        job_id,
+        *_owns_run(attempt),
+        status=JobStatus.completed,
+        result=result_payload,
+        error=None,
+    )
 
 
 async def mark_job_failed(
-    *, session: AsyncSession, job_id: UUID, error_message: str
+    *, session: AsyncSession, job_id: UUID, attempt: int, error_message: str
 ) -> ImageJob | None:
-    job = await session.get(ImageJob, job_id, with_for_update=True)
-    if job is None:
-        return None
-    job.status = JobStatus.failed
-    job.result = None
-    job.error = error_message
-    job.updated_at = datetime.utcnow()
+    """Fail the run claimed as ``attempt``; ``None`` if it lost ownership."""
+    return await _update_job(
+        session,
+        job_id,
+        *_owns_run(attempt),
+        status=JobStatus.failed,
+        result=None,
+        error=error_message,
+    )
+
+
+async def reclaim_stuck_jobs(
+    *, session: AsyncSession, settings: RuntimeSettings
+) -> list[UUID]:
+    """Fail jobs claimed longer than the visibility timeout ago.
+
+    ``updated_at`` is only set when a run claims the row, so a run that is
+    merely slow is reclaimed as well. It keeps running, but the ownership
+    guard on the terminal transitions rejects its late result. The stuck run
+    was already counted in ``attempts`` when it was claimed. Returns the ids
+    that still have attempts left and should be requeued.
+    """
+    cutoff = func.now() - timedelta(seconds=settings.job_visibility_timeout_seconds)
+    stmt = (
+        update(ImageJob)
+        .where(ImageJob.status == JobStatus.processing, ImageJob.updated_at < cutoff)
+        .values(status=JobStatus.failed, result=None, error="Processing timed out")
+        .returning(ImageJob.id, ImageJob.attempts)
+    )
+    rows = (await session.execute(stmt)).all()
     await session.commit()
-    await session.refresh(job)
-    return job
+    return [
+        job_id for job_id, attempts in rows if attempts < settings.job_max_attempts
+    ]
 
 
 async def get_metrics(*, session: AsyncSession) -> dict[str, int]:
-    result = await session.execute(
-        select(ImageJob.status, func.count(ImageJob.id)).group_by(ImageJob.status)
-    )
+    result = await session.execute(_METRICS_STMT)
     counts: dict[str, int] = {status.value: 0 for status in JobStatus}
     for status, count in result.all():
         counts[status.value] = int(count)
     counts["total"] = sum(counts.values())
     return counts
+
+
+async def get_cached_metrics(
+    *, session: AsyncSession, redis: Redis, settings: RuntimeSettings
+) -> dict[str, int]:
+    """Serve ``get_metrics`` from Redis, recomputing at most once per TTL.
+
+    When the fresh copy expires, one caller takes a short lock and recomputes
+    while concurrent callers keep serving the longer-lived stale copy.
+    """
+    fresh_key = settings.metrics_cache_key
+    stale_key = f"{fresh_key}:stale"
+    lock_key = f"{fresh_key}:lock"
+    ttl = settings.metrics_cache_ttl_seconds
+
+    fresh, stale = await redis.mget(fresh_key, stale_key)
+    if fresh is not None:
+        return orjson.loads(fresh)
+
+    acquired = await redis.set(lock_key, "1", nx=True, ex=ttl)
+    if not acquired and stale is not None:
+        return orjson.loads(stale)
+
+    counts = await get_metrics(session=session)
+    payload = orjson.dumps(counts)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(fresh_key, payload, ex=ttl)
+        pipe.set(stale_key, payload, ex=ttl * 30)
+        if acquired:
+            pipe.delete(lock_key)
+        await pipe.execute()
+    return counts
@@ -1,8 +1,16 @@
-from app.db.init_db import init_db_sync
+import asyncio
+
+from app.db.init_db import backfill_url_hashes, init_db
+
+
+async def _upgrade() -> None:
+    await init_db()
+    # One-off data migrations stay out of API startup, which runs init_db only.
+    await backfill_url_hashes()
 
 
 def main() -> None:
-    init_db_sync()
+    asyncio.run(_upgrade())
 
 
 if __name__ == "__main__":
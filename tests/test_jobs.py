@@ -0,0 +1,253 @@
+import asyncio
+import base64
+import dataclasses
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID, uuid4
+
+import fakeredis
+import pytest
+
+from app.core.config import get_settings
+from app.models.image_job import ImageJob, JobStatus
+from app.services.jobs import (
+    InvalidCursorError,
+    _find_latest_job,
+    compute_url_hash,
+    create_jobs_bulk,
+    decode_cursor,
+    encode_cursor,
+    enqueue_jobs,
+    schedule_jobs,
+)
+
+
+class StubResult:
+    def __init__(self, rows: Sequence[ImageJob]) -> None:
+        self._rows = list(rows)
+
+    def scalars(self) -> "StubResult":
+        return self
+
+    def first(self) -> ImageJob | None:
+        return self._rows[0] if self._rows else None
+
+    def all(self) -> list[ImageJob]:
+        return self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class StubSession:
+    """Just enough of AsyncSession for the job services, newest rows last.
+
+    SELECTs return the newest rows for the bound url hash(es), INSERTs append
+    pending rows and UPDATEs apply their values to the matched ids, standing
+    in for ``populate_existing``.
+    """
+
+    def __init__(self, rows: Sequence[ImageJob] = ()) -> None:
+        self.rows = list(rows)
+        self.executed = 0
+
+    async def get(self, model: type[ImageJob], job_id: UUID) -> ImageJob | None:
+        return next((job for job in self.rows if job.id == job_id), None)
+
+    async def execute(self, stmt: Any, params: dict[str, Any] | None = None) -> Any:
+        self.executed += 1
+        if stmt.is_update:
+            values = stmt.compile().params
+            ids = next(v for k, v in values.items() if k.startswith("id_"))
+            for job in self.rows:
+                if job.id in ids:
+                    job.status, job.error = values["status"], values["error"]
+            return StubResult([])
+        params = params or {}
+        hashes = params.get("url_hashes") or [params.get("url_hash")]
+        matches = [job for job in reversed(self.rows) if job.url_hash in hashes]
+        return StubResult(matches)
+
+    async def scalars(self, stmt: Any, rows: Sequence[dict[str, Any]]) -> Any:
+        created = [
+            ImageJob(id=uuid4(), attempts=0, error=None, **row) for row in rows
+        ]
+        self.rows.extend(created)
+        return StubResult(created)
+
+    async def commit(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
+
+
+def test_cursor_round_trip() -> None:
+    job = ImageJob(
+        id=uuid4(), created_at=datetime(2024, 5, 1, 12, 30, 1, 123456, timezone.utc)
+    )
+    cursor = encode_cursor(job)
+    assert decode_cursor(cursor) == (job.created_at, job.id)
+
+
+def test_cursor_is_url_safe() -> None:
+    job = ImageJob(id=uuid4(), created_at=datetime.now(timezone.utc))
+    cursor = encode_cursor(job)
+    assert not set(cursor) & {"+", "/"}
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not base64!",
+        "äöü",
+        base64.urlsafe_b64encode(b"2024-05-01T12:30:01+00:00").decode(),
+        base64.urlsafe_b64encode(b"not-a-date|" + str(uuid4()).encode()).decode(),
+        base64.urlsafe_b64encode(b"2024-05-01T12:30:01+00:00|not-a-uuid").decode(),
+        base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    ],
+)
+def test_decode_cursor_rejects_malformed(cursor: str) -> None:
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("duplicate_handling", ["allow-retry", "reject-active"])
+def test_enqueue_jobs_writes_url_hash_pointer(duplicate_handling: str) -> None:
+    settings = dataclasses.replace(
+        get_settings(), duplicate_handling=duplicate_handling
+    )
+    job = ImageJob(id=uuid4(), url="https://example.com/a.jpg", url_hash="abc")
+
+    async def scenario() -> tuple[float | None, str | None]:
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await enqueue_jobs(redis, settings, [job])
+        score = await redis.zscore(settings.queue_name, str(job.id))
+        pointer = await redis.get(f"{settings.url_hash_cache_prefix}:abc")
+        return score, pointer
+
+    score, pointer = asyncio.run(scenario())
+    assert score is not None
+    assert pointer == str(job.id)
+
+
+@pytest.mark.parametrize("pointer", ["not-a-uuid", str(uuid4())])
+def test_find_latest_job_falls_back_to_select_on_bad_pointer(pointer: str) -> None:
+    settings = get_settings()
+    latest = ImageJob(id=uuid4(), url="https://example.com/a.jpg", url_hash="abc")
+    session = StubSession(rows=[latest])
+
+    async def scenario() -> ImageJob | None:
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await redis.set(f"{settings.url_hash_cache_prefix}:abc", pointer)
+        return await _find_latest_job(session, redis, settings, "abc")
+
+    assert asyncio.run(scenario()) is latest
+    assert session.executed == 1
+
+
+def test_schedule_jobs_scores_by_redis_clock_in_submission_order() -> None:
+    settings = get_settings()
+    job_ids = sorted((str(uuid4()) for _ in range(5)), reverse=True)
+
+    async def scenario() -> tuple[list[tuple[str, float]], float]:
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await schedule_jobs(redis, settings, job_ids, delay_seconds=30)
+        seconds, microseconds = await redis.time()
+        queued = await redis.zrange(settings.queue_name, 0, -1, withscores=True)
+        return queued, seconds + microseconds / 1_000_000
+
+    queued, now = asyncio.run(scenario())
+    assert [job_id for job_id, _ in queued] == job_ids
+    assert all(now + 29 < ready_at <= now + 31 for _, ready_at in queued)
+
+
+URL_A = "https://example.com/a.jpg"
+URL_B = "https://example.com/b.jpg"
+
+
+def _existing_job(url: str, status: JobStatus) -> ImageJob:
+    return ImageJob(
+        id=uuid4(), url=url, url_hash=compute_url_hash(url), status=status, attempts=1
+    )
+
+
+def _create_bulk(
+    duplicate_handling: str,
+    session: StubSession,
+    urls: Sequence[str],
+    redis: fakeredis.FakeAsyncRedis | None = None,
+) -> tuple[list[ImageJob], list[ImageJob], list[ImageJob]]:
+    settings = dataclasses.replace(
+        get_settings(), duplicate_handling=duplicate_handling
+    )
+
+    async def scenario() -> tuple[list[ImageJob], list[ImageJob], list[ImageJob]]:
+        return await create_jobs_bulk(
+            session=session,
+            redis=redis or fakeredis.FakeAsyncRedis(decode_responses=True),
+            settings=settings,
+            urls=urls,
+        )
+
+    return asyncio.run(scenario())
+
+
+def test_create_jobs_bulk_allow_retry_creates_every_url() -> None:
+    session = StubSession([_existing_job(URL_A, JobStatus.completed)])
+    accepted, duplicates, failed = _create_bulk(
+        "allow-retry", session, [URL_A, URL_B, URL_B]
+    )
+
+    assert [job.url for job in accepted] == [URL_A, URL_B, URL_B]
+    assert len({job.id for job in accepted}) == 3
+    assert all(job.status == JobStatus.pending for job in accepted)
+    assert duplicates == failed == []
+    assert session.executed == 0
+
+
+def test_create_jobs_bulk_reuse_completed() -> None:
+    completed = _existing_job(URL_A, JobStatus.completed)
+    session = StubSession([completed])
+    accepted, duplicates, failed = _create_bulk(
+        "reuse-completed", session, [URL_A, URL_B, URL_B.upper(), URL_A]
+    )
+
+    assert accepted[0] is accepted[3] is completed
+    # Pending jobs are never reused, so the repeated B gets a job of its own.
+    assert [job.status for job in accepted[1:3]] == [JobStatus.pending] * 2
+    assert accepted[1].id != accepted[2].id
+    assert duplicates == failed == []
+
+
+def test_create_jobs_bulk_reject_active() -> None:
+    active = _existing_job(URL_A, JobStatus.processing)
+    session = StubSession([active])
+    accepted, duplicates, failed = _create_bulk(
+        "reject-active", session, [URL_A, URL_B, URL_B]
+    )
+
+    assert [job.url for job in accepted] == [URL_B]
+    assert [job.id for job in duplicates] == [active.id, accepted[0].id]
+    assert failed == []
+
+
+def test_create_jobs_bulk_marks_unqueued_jobs_failed() -> None:
+    server = fakeredis.FakeServer()
+    server.connected = False
+    session = StubSession()
+    accepted, duplicates, failed = _create_bulk(
+        "reject-active",
+        session,
+        [URL_A, URL_A, URL_B],
+        redis=fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+
+    assert accepted == duplicates == []
+    # The in-batch duplicate of A reports A's failure, so each URL has one outcome.
+    assert [job.url for job in failed] == [URL_A, URL_A, URL_B]
+    assert failed[0] is failed[1]
+    assert all(job.status == JobStatus.failed for job in failed)
+    assert all(job.error.startswith("Failed to enqueue job:") for job in failed)
@@ -1,7 +1,21 @@
-from app.core.config import get_settings
+from dataclasses import FrozenInstanceError, fields
+
+import pytest
+
+from app.core.config import RuntimeSettings, Settings, get_settings
 
 
 def test_settings_defaults() -> None:
     settings = get_settings()
     assert settings.app_name == "ThumbForge"
     assert settings.api_v1_prefix == "/v1"
+
+
+def test_runtime_settings_mirror_loaded_settings() -> None:
+    loaded = set(Settings.model_fields)
+    runtime = {field.name for field in fields(RuntimeSettings)}
+    assert runtime == loaded
+
+    settings = get_settings()
+    with pytest.raises(FrozenInstanceError):
+        settings.app_name = "Other"  # type: ignore[misc]
@@ -0,0 +1,87 @@
+import asyncio
+import dataclasses
+import time
+from uuid import UUID, uuid4
+
+import fakeredis
+import pytest
+
+from app.core.config import get_settings
+from worker import main as worker_main
+from worker.main import CLAIM_JOBS_LUA, claim_jobs, requeue_orphaned_jobs
+
+settings = get_settings()
+
+
+def _redis() -> fakeredis.FakeAsyncRedis:
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def test_claim_script_moves_only_ready_ids_into_inflight() -> None:
+    ready, delayed = str(uuid4()), str(uuid4())
+
+    async def scenario() -> tuple[list[str], list[str], dict[str, str]]:
+        redis = _redis()
+        now = time.time()
+        await redis.zadd(settings.queue_name, {ready: now - 1, delayed: now + 60})
+        claim = redis.register_script(CLAIM_JOBS_LUA)
+        claimed = await claim(
+            keys=[settings.queue_name, settings.processing_queue_name], args=[10]
+        )
+        queued = await redis.zrange(settings.queue_name, 0, -1)
+        inflight = await redis.hgetall(settings.processing_queue_name)
+        return claimed, queued, inflight
+
+    claimed, queued, inflight = asyncio.run(scenario())
+    assert claimed == [ready]
+    assert queued == [delayed]
+    assert list(inflight) == [ready]
+
+
+def test_claim_jobs_respects_limit_and_drops_invalid_ids() -> None:
+    job_ids = [uuid4() for _ in range(3)]
+
+    async def scenario() -> tuple[list[UUID], list[UUID], int, list[str]]:
+        redis = _redis()
+        now = time.time()
+        scores = {str(job_id): now - 5 + i for i, job_id in enumerate(job_ids)}
+        await redis.zadd(settings.queue_name, {"not-a-uuid": now - 10, **scores})
+        claim = redis.register_script(CLAIM_JOBS_LUA)
+        first = await claim_jobs(redis, claim, settings, 2)
+        rest = await claim_jobs(redis, claim, settings, 10)
+        remaining = await redis.zcard(settings.queue_name)
+        inflight = await redis.hkeys(settings.processing_queue_name)
+        return first, rest, remaining, inflight
+
+    first, rest, remaining, inflight = asyncio.run(scenario())
+    # The invalid id takes one of the two slots and is dropped from in-flight.
+    assert first == job_ids[:1]
+    assert rest == job_ids[1:]
+    assert remaining == 0
+    assert sorted(inflight) == sorted(str(j) for j in job_ids)
+
+
+def test_requeue_orphaned_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
+    reclaimed, stale, fresh = uuid4(), str(uuid4()), str(uuid4())
+
+    async def fake_reclaim(**_: object) -> list[UUID]:
+        return [reclaimed]
+
+    monkeypatch.setattr(worker_main, "reclaim_stuck_jobs", fake_reclaim)
+    patched = dataclasses.replace(settings, job_visibility_timeout_seconds=60)
+
+    async def scenario() -> tuple[list[str], list[str]]:
+        redis = _redis()
+        now = time.time()
+        await redis.hset(
+            patched.processing_queue_name,
+            mapping={str(reclaimed): now - 120, stale: now - 120, fresh: now},
+        )
+        await requeue_orphaned_jobs(redis, patched)
+        queued = await redis.zrange(patched.queue_name, 0, -1)
+        inflight = await redis.hkeys(patched.processing_queue_name)
+        return queued, inflight
+
+    queued, inflight = asyncio.run(scenario())
+    assert sorted(queued) == sorted([str(reclaimed), stale])
+    assert inflight == [fresh]
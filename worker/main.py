@@ -1,24 +1,31 @@
 from __future__ import annotations
 
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
-from io import BytesIO
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from pathlib import Path
 from typing import Any
 from uuid import UUID
 
+import aiofiles
+import aiofiles.os
 import aiohttp
 from PIL import Image
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import Settings, get_settings
+from app.core.config import RuntimeSettings, get_settings
 from app.core.logging import configure_logging, get_logger
 from app.db.session import SessionLocal
-from app.models.image_job import JobStatus
 from app.services.jobs import (
     mark_job_completed,
     mark_job_failed,
     mark_job_processing,
+    reclaim_stuck_jobs,
+    reschedule_job,
+    schedule_jobs,
 )
 
 logger = get_logger("thumbforge.worker")
@@ -29,122 +36,311 @@ DEFAULT_HTTP_HEADERS = {
     ),
     "Accept": "image/*,application/octet-stream;q=0.9,*/*;q=0.8",
 }
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+ORPHAN_SWEEP_INTERVAL_SECONDS = 60
 
+# Claims up to ARGV[1] ready ids (score <= now) from the scheduling ZSET in one
+# atomic step, recording each in the in-flight hash with its claim time. "Now"
+# is the Redis clock that SCHEDULE_JOBS_LUA scores against, never this host's.
+CLAIM_JOBS_LUA = """
+local t = redis.call('TIME')
+local now = string.format('%.6f', tonumber(t[1]) + tonumber(t[2]) / 1000000)
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, ARGV[1])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('HSET', KEYS[2], id, now)
+end
+return ids
+"""
 
-def _process_image(data: bytes, size: int, destination: str) -> dict[str, Any]:
+
+def _process_image(src_path: str, size: int, destination: str) -> dict[str, Any]:
+    source_path = Path(src_path)
     destination_path = Path(destination)
     destination_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with Image.open(BytesIO(data)) as img:
-        img.load()
+    with Image.open(source_path) as img:
         original_width, original_height = img.size
         fmt = (img.format or "JPEG").upper()
+        # Let libjpeg decode at a reduced DCT scale; no-op for other formats.
+        img.draft("RGB", (size * 2, size * 2))
+        img.load()
         if img.mode not in ("RGB", "L"):
             img = img.convert("RGB")
-        img.thumbnail((size, size))
+        img.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
         img.save(destination_path, format="JPEG", quality=90)
 
     return {
         "width": original_width,
         "height": original_height,
         "format": fmt,
-        "size_bytes": len(data),
+        "size_bytes": source_path.stat().st_size,
         "thumbnail_path": str(destination_path),
     }
 
 
+async def _fail_job(
+    *,
+    session: AsyncSession,
+    redis: Redis,
+    settings: RuntimeSettings,
+    job_id: UUID,
+    attempt: int,
+    error_message: str,
+) -> None:
+    job = await mark_job_failed(
+        session=session, job_id=job_id, attempt=attempt, error_message=error_message
+    )
+    if job is None:
+        logger.warning("worker.job_ownership_lost", job_id=str(job_id))
+        return
+    if job.attempts >= settings.job_max_attempts:
+        return
+    delay = settings.job_retry_backoff_seconds * 2 ** (job.attempts - 1)
+    await reschedule_job(redis, settings, job_id, delay)
+    logger.info(
+        "worker.job_retry_scheduled",
+        job_id=str(job_id),
+        attempts=job.attempts,
+        delay_seconds=delay,
+    )
+
+
 async def process_job(
     *,
     job_id: UUID,
+    redis: Redis,
     http: aiohttp.ClientSession,
-    executor: ProcessPoolExecutor,
-    settings: Settings,
+    executor: ThreadPoolExecutor,
+    settings: RuntimeSettings,
 ) -> None:
     async with SessionLocal() as session:
-        job = await mark_job_processing(session=session, job_id=job_id)
+        job = await mark_job_processing(
+            session=session, job_id=job_id, max_attempts=settings.job_max_attempts
+        )
         if job is None:
-            logger.warning("worker.job_missing", job_id=str(job_id))
-            return
-        if job.status != JobStatus.processing:
-            logger.info(
-                "worker.job_skipped", job_id=str(job_id), status=job.status.value
-            )
+            logger.info("worker.job_not_claimed", job_id=str(job_id))
             return
 
+        # The body is streamed to disk rather than buffered in memory; the
+        # thumbnail thread opens it by path.
+        download_path = Path(settings.storage_path) / f"{job_id}.download"
         try:
-            async with http.get(
-                job.url,
-                timeout=settings.http_timeout_seconds,
-                headers=DEFAULT_HTTP_HEADERS,
-            ) as response:
-                if response.status >= 400:
-                    raise RuntimeError(
-                        f"Failed to fetch image: status={response.status}"
-                    )
-                payload = await response.read()
-                content_type = response.headers.get("Content-Type")
-        except Exception as exc:  # pragma: no cover - network errors
-            await mark_job_failed(
-                session=session, job_id=job_id, error_message=str(exc)
-            )
-            logger.exception(
-                "worker.download_failed", job_id=str(job_id), error=str(exc)
-            )
-            return
+            try:
+                async with http.get(
+                    job.url,
+                    timeout=settings.http_timeout_seconds,
+                    headers=DEFAULT_HTTP_HEADERS,
+                ) as response:
+                    if response.status >= 400:
+                        raise RuntimeError(
+                            f"Failed to fetch image: status={response.status}"
+                        )
+                    content_type = response.headers.get("Content-Type")
+                    async with aiofiles.open(download_path, "wb") as download:
+                        async for chunk in response.content.iter_chunked(
+                            DOWNLOAD_CHUNK_SIZE
+                        ):
+                            await download.write(chunk)
+            except Exception as exc:  # pragma: no cover - network errors
+                await _fail_job(
+                    session=session,
+                    redis=redis,
+                    settings=settings,
+                    job_id=job_id,
+                    attempt=job.attempts,
+                    error_message=str(exc),
+                )
+                logger.exception(
+                    "worker.download_failed", job_id=str(job_id), error=str(exc)
+                )
+                return
 
-        loop = asyncio.get_running_loop()
-        destination = Path(settings.storage_path) / f"{job_id}.jpg"
-        try:
-            metadata = await loop.run_in_executor(
-                executor,
-                _process_image,
-                payload,
-                settings.thumbnail_size,
-                str(destination),
-            )
-        except Exception as exc:  # pragma: no cover - CPU errors
-            await mark_job_failed(
-                session=session, job_id=job_id, error_message=str(exc)
-            )
-            logger.exception(
-                "worker.processing_failed", job_id=str(job_id), error=str(exc)
-            )
-            return
+            loop = asyncio.get_running_loop()
+            destination = Path(settings.storage_path) / f"{job_id}.jpg"
+            try:
+                metadata = await loop.run_in_executor(
+                    executor,
+                    _process_image,
+                    str(download_path),
+                    settings.thumbnail_size,
+                    str(destination),
+                )
+            except Exception as exc:  # pragma: no cover - CPU errors
+                await _fail_job(
+                    session=session,
+                    redis=redis,
+                    settings=settings,
+                    job_id=job_id,
+                    attempt=job.attempts,
+                    error_message=str(exc),
+                )
+                logger.exception(
+                    "worker.processing_failed", job_id=str(job_id), error=str(exc)
+                )
+                return
+        finally:
+            with suppress(FileNotFoundError):
+                await aiofiles.os.remove(download_path)
 
         metadata.update({"source_content_type": content_type, "source_url": job.url})
-        await mark_job_completed(
-            session=session, job_id=job_id, result_payload=metadata
+        completed = await mark_job_completed(
+            session=session,
+            job_id=job_id,
+            attempt=job.attempts,
+            result_payload=metadata,
         )
+        if completed is None:
+            logger.warning("worker.job_ownership_lost", job_id=str(job_id))
+            return
         logger.info("worker.job_completed", job_id=str(job_id))
 
 
-async def consume(settings: Settings) -> None:
+async def claim_jobs(
+    redis: Redis, claim_script: AsyncScript, settings: RuntimeSettings, limit: int
+) -> list[UUID]:
+    """Atomically claim up to ``limit`` ready ids into the in-flight hash."""
+    claimed = await claim_script(
+        keys=[settings.queue_name, settings.processing_queue_name],
+        args=[limit],
+    )
+    job_ids: list[UUID] = []
+    for raw in claimed:
+        try:
+            job_ids.append(UUID(raw))
+        except ValueError:
+            logger.warning("worker.invalid_job_id", job_id=raw)
+            await redis.hdel(settings.processing_queue_name, raw)
+    return job_ids
+
+
+async def _redis_now(redis: Redis) -> float:
+    seconds, microseconds = await redis.time()
+    return seconds + microseconds / 1_000_000
+
+
+async def idle_delay(redis: Redis, settings: RuntimeSettings) -> float:
+    """Seconds until the next scheduled job, capped at ``worker_idle_poll_seconds``."""
+    delay = settings.worker_idle_poll_seconds
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zrange(settings.queue_name, 0, 0, withscores=True)
+        pipe.time()
+        upcoming, (seconds, microseconds) = await pipe.execute()
+    if upcoming:
+        _, ready_at = upcoming[0]
+        now = seconds + microseconds / 1_000_000
+        delay = min(delay, max(ready_at - now, 0.0))
+    return delay
+
+
+async def requeue_orphaned_jobs(redis: Redis, settings: RuntimeSettings) -> None:
+    """Requeue jobs abandoned by a crashed or stalled worker.
+
+    Rows stuck in ``processing`` are reclaimed in the database first. In-flight
+    entries older than the visibility timeout are requeued as well, which covers
+    ids claimed but never marked processing; ``mark_job_processing`` drops any
+    that are no longer claimable.
+    """
+    async with SessionLocal() as session:
+        reclaimed = await reclaim_stuck_jobs(session=session, settings=settings)
+    cutoff = await _redis_now(redis) - settings.job_visibility_timeout_seconds
+    inflight = await redis.hgetall(settings.processing_queue_name)
+    stale = [
+        job_id for job_id, claimed_at in inflight.items() if float(claimed_at) < cutoff
+    ]
+    orphaned = sorted({str(job_id) for job_id in reclaimed}.union(stale))
+    if not orphaned:
+        return
+    await schedule_jobs(redis, settings, orphaned)
+    await redis.hdel(settings.processing_queue_name, *orphaned)
+    logger.info(
+        "worker.requeued_orphans", count=len(orphaned), reclaimed=len(reclaimed)
+    )
+
+
+async def consume(settings: RuntimeSettings) -> None:
     configure_logging(settings.log_level)
     Path(settings.storage_path).mkdir(parents=True, exist_ok=True)
 
     redis = Redis.from_url(settings.redis_url, decode_responses=True)
-    executor = ProcessPoolExecutor(max_workers=settings.worker_processes)
+    claim_script = redis.register_script(CLAIM_JOBS_LUA)
+    # Pillow releases the GIL while decoding, resizing and encoding, so threads
+    # parallelize thumbnailing without the IPC cost of a process pool.
+    executor = ThreadPoolExecutor(
+        max_workers=settings.worker_processes, thread_name_prefix="thumbnail"
+    )
+    inflight: set[asyncio.Task[None]] = set()
 
-    timeout = settings.worker_poll_timeout
     client_timeout = aiohttp.ClientTimeout(total=settings.http_timeout_seconds)
     try:
+        await requeue_orphaned_jobs(redis, settings)
+        # Keep-alive connections are reused across prefetched jobs; the per-host
+        # cap stops one busy CDN from taking every slot.
+        connector = aiohttp.TCPConnector(
+            limit=settings.http_max_connections,
+            limit_per_host=settings.http_max_connections_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
         async with aiohttp.ClientSession(
-            timeout=client_timeout, headers=DEFAULT_HTTP_HEADERS
+            connector=connector, timeout=client_timeout, headers=DEFAULT_HTTP_HEADERS
         ) as http:
-            while True:
+
+            async def run(job_id: UUID) -> None:
                 try:
-                    item = await redis.brpop(settings.queue_name, timeout=timeout)
-                    if item is None:
-                        continue
-                    _, job_id_raw = item
-                    job_id = UUID(job_id_raw)
                     await process_job(
-                        job_id=job_id, http=http, executor=executor, settings=settings
+                        job_id=job_id,
+                        redis=redis,
+                        http=http,
+                        executor=executor,
+                        settings=settings,
+                    )
+                except Exception as exc:  # pragma: no cover - defensive logging
+                    logger.exception(
+                        "worker.job_error", job_id=str(job_id), error=str(exc)
                     )
+                await redis.hdel(settings.processing_queue_name, str(job_id))
+
+            last_sweep = time.monotonic()
+            while True:
+                try:
+                    if time.monotonic() - last_sweep >= ORPHAN_SWEEP_INTERVAL_SECONDS:
+                        await requeue_orphaned_jobs(redis, settings)
+                        last_sweep = time.monotonic()
+                    # Claim only as many ids as there are free slots, so nothing
+                    # sits claimed but idle, and refill as soon as any job ends.
+                    free = settings.worker_max_inflight - len(inflight)
+                    if free <= 0:
+                        await asyncio.wait(
+                            inflight, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        continue
+                    limit = min(free, settings.worker_prefetch)
+                    job_ids = await claim_jobs(redis, claim_script, settings, limit)
+                    for job_id in job_ids:
+                        task = asyncio.create_task(run(job_id))
+                        inflight.add(task)
+                        task.add_done_callback(inflight.discard)
+                    if job_ids:
+                        continue
+                    delay = await idle_delay(redis, settings)
+                    if inflight:
+                        await asyncio.wait(
+                            inflight,
+                            timeout=delay,
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                    else:
+                        await asyncio.sleep(delay)
                 except asyncio.CancelledError:
                     break
                 except Exception as exc:  # pragma: no cover - defensive logging
                     logger.exception("worker.loop_error", error=str(exc))
+
+            # Unfinished ids stay in the in-flight hash and are reclaimed later.
+            for task in inflight:
+                task.cancel()
+            await asyncio.gather(*inflight, return_exceptions=True)
     finally:
         executor.shutdown(wait=True)
         await redis.close()